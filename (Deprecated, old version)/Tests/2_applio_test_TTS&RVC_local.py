@@ -27,75 +27,176 @@ sys.path.append(applio_dir)
 # ----------------------------------------------------------------------------------
 # STEP 2: IMPORTING CORE FUNCTIONALITY 🔑
 # ----------------------------------------------------------------------------------
+import asyncio
+import functools
+import io
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 try:
-    from core import run_tts_script  # Maybe it will say that the module is not found, but it works anyway
-    print("✅ Applio core function imported successfully.")
+    import edge_tts
+    import librosa
+    import numpy as np
+    import soundfile as sf
+    import rvc.infer.pipeline as rvc_pipeline  # Maybe it will say that the module is not found, but it works anyway
+    from rvc.infer.infer import VoiceConverter
+    print("✅ Applio RVC pipeline imported successfully.")
 except ImportError as e:
     print(f"❌ Import error: Unable to load Applio core functions: {e}")
     sys.exit(1)
 
+RVC_SAMPLE_RATE = 16000  # RVC (contentvec and RMVPE) works on 16 kHz audio
+
 # ----------------------------------------------------------------------------------
-# STEP 3: MAIN CONVERSION FUNCTION 🛠️
+# STEP 3: RESIDENT CONVERSION SERVICE 🛠️
 # ----------------------------------------------------------------------------------
 
-def ejecutar_conversion_completa(texto, voz_tts_base, modelo_rvc, index_rvc, ruta_tts_intermedio, ruta_salida_final):
+class _FaissResidente:
+    """Stands in for the `faiss` module inside Applio's pipeline, so each .index file is read from disk only once."""
+    def __init__(self, faiss_module):
+        self._faiss = faiss_module
+        self.read_index = functools.lru_cache(maxsize=4)(faiss_module.read_index)
+
+    def __getattr__(self, name):
+        return getattr(self._faiss, name)
+
+def mantener_modelos_residentes():
     """
-    Executes the entire TTS + RVC pipeline:
-    1. Generates speech audio from input text (TTS).
-    2. Applies the selected voice model (RVC) to the generated audio.
+    Applio's pipeline reads the FAISS index and builds a new RMVPE predictor on every call.
+    Both are swapped here for cached versions, so they are loaded once per process.
     """
-    print("\n--- 🚀 STARTING FULL PIPELINE (TTS + RVC) ---")
+    faiss = getattr(rvc_pipeline, "faiss", None)
+    if isinstance(faiss, _FaissResidente):
+        return # Already done by an earlier service in this process
+    if faiss is not None:
+        rvc_pipeline.faiss = _FaissResidente(faiss)
+    else:
+        print("⚠️  Warning: Applio's pipeline layout changed, the FAISS index will be re-read for every line.")
+    # The predictor class name depends on the Applio version
+    for nombre in ("RMVPE0Predictor", "RMVPE"):
+        predictor = getattr(rvc_pipeline, nombre, None)
+        if predictor is not None:
+            if not hasattr(predictor, "cache_info"): # Not cached yet
+                setattr(rvc_pipeline, nombre, functools.lru_cache(maxsize=2)(predictor))
+            return
+    print("⚠️  Warning: RMVPE predictor not found in Applio's pipeline, it will be reloaded for every line.")
+
+class ServicioConversionRVC:
+    """
+    Long-lived TTS + RVC pipeline for rendering many lines with one character voice.
+    The RVC model, its FAISS index, the RMVPE f0 extractor and the contentvec embedder are loaded once.
+    TTS (edge-tts, network bound) runs on a pool of workers and hands each line to the RVC worker in memory,
+    so lines are synthesized while earlier ones are being converted and nothing is written but the results.
+    """
+    def __init__(self, modelo_rvc, index_rvc, voz_tts_base, tts_workers=4, tts_rate=0, pitch=0, index_rate=0.8,
+                 rms_mix_rate=1.0, protect=0.5, f0_method="rmvpe", embedder_model="contentvec", sid=0):
+        inicio = time.perf_counter()
+        self.index_rvc = index_rvc
+        self.voz_tts_base = voz_tts_base
+        self.tts_workers = tts_workers
+        self.tts_rate = tts_rate
+        self.opciones_rvc = dict(pitch=pitch, f0_method=f0_method, index_rate=index_rate,
+                                 volume_envelope=rms_mix_rate, protect=protect, sid=sid)
+        mantener_modelos_residentes()
+        self.convertidor = VoiceConverter()
+        self.convertidor.get_vc(modelo_rvc, sid)
+        self.convertidor.load_hubert(embedder_model)
+        self.sample_rate = self.convertidor.tgt_sr
+        # One throw-away pass loads the index and RMVPE before the first real line
+        self.convertir_rvc(np.zeros(RVC_SAMPLE_RATE, dtype=np.float32))
+        print(f"✅ RVC model, index, RMVPE and {embedder_model} loaded in {time.perf_counter() - inicio:.1f}s.")
+
+    def sintetizar(self, texto):
+        """TTS stage: edge-tts audio decoded in memory, as 16 kHz mono float32."""
+        async def descargar():
+            comunicacion = edge_tts.Communicate(texto, self.voz_tts_base, rate=f"{self.tts_rate:+d}%")
+            mp3 = bytearray()
+            async for fragmento in comunicacion.stream():
+                if fragmento["type"] == "audio":
+                    mp3.extend(fragmento["data"])
+            return bytes(mp3)
+
+        audio, sr = sf.read(io.BytesIO(asyncio.run(descargar())), dtype="float32")
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        return librosa.resample(audio, orig_sr=sr, target_sr=RVC_SAMPLE_RATE)
 
-    try:
-        # Define the argument list in the expected positional order
-        args_proceso = [
-            None,  # input_tts_path (not used; using direct text input)
-            texto,  # tts_text
-            voz_tts_base,  # tts_voice
-            0,  # tts_rate
-            0,  # pitch
-            0.8,  # index_rate
-            1.0,  # rms_mix_rate
-            0.5,  # protect
-            "rmvpe",  # f0_method
-            ruta_tts_intermedio,  # output_tts_path (intermediate TTS audio)
-            ruta_salida_final,    # output_rvc_path (final processed audio)
-            modelo_rvc,  # model_file
-            index_rvc,  # index_file
-            False,  # split_audio
-            False,  # autotune
-            1.0,  # autotune_strength
-            False,  # proposed_pitch
-            155.0,  # proposed_pitch_threshold
-            False,  # clean_audio
-            0.5,  # clean_strength
-            "WAV",  # export_format
-            "contentvec",  # embedder_model
-            None,  # embedder_model_custom
-            0,  # sid
-        ]
-        
-        resultado = run_tts_script(*args_proceso)
-        
-        if "successfully" in resultado[0]:
-            print(f"✅ Success: {resultado[0]}")
-            print(f"🗣️  Base audio (TTS) saved at: {ruta_tts_intermedio}")
-            print(f"🤖 Final audio (RVC) saved at: {ruta_salida_final}")
-            return True
-        else:
-            print(f"⚠️  Warning: {resultado[0]}")
-            return False
-    except Exception as e:
-        print(f"❌ Critical error during execution: {e}")
-        return False
+    def convertir_rvc(self, audio):
+        """RVC stage, with the resident model (same steps as VoiceConverter.convert_audio, without the files)."""
+        audio_max = np.abs(audio).max() / 0.95
+        if audio_max > 1:
+            audio = audio / audio_max
+        vc = self.convertidor
+        return vc.vc.pipeline(
+            model=vc.hubert_model,
+            net_g=vc.net_g,
+            audio=audio,
+            file_index=self.index_rvc,
+            pitch_guidance=vc.use_f0,
+            version=vc.version,
+            f0_autotune=False,
+            f0_autotune_strength=1.0,
+            proposed_pitch=False,
+            proposed_pitch_threshold=155.0,
+            **self.opciones_rvc,
+        )
+
+    def convertir_lote(self, trabajos, guardar_audio_base=False):
+        """
+        Renders a batch of (texto, ruta_salida) jobs. Returns one (ruta_salida, ok, mensaje) per job, in order.
+        With `guardar_audio_base` the TTS audio is also saved next to each result, for comparison.
+        """
+        resultados = [None] * len(trabajos)
+        # Bounded, so TTS does not run too far ahead of the GPU and pile up audio in memory
+        cola_rvc = queue.Queue(maxsize=2 * self.tts_workers)
+
+        def trabajador_rvc():
+            while (trabajo := cola_rvc.get()) is not None:
+                i, audio, ruta_salida = trabajo
+                try:
+                    sf.write(ruta_salida, self.convertir_rvc(audio), self.sample_rate)
+                    resultados[i] = (ruta_salida, True, "converted successfully")
+                    print(f"🤖 [{i + 1}/{len(trabajos)}] Final audio (RVC) saved at: {ruta_salida}")
+                except Exception as e:
+                    resultados[i] = (ruta_salida, False, f"RVC failed: {e}")
+                    print(f"❌ [{i + 1}/{len(trabajos)}] RVC failed: {e}")
+
+        # A single RVC worker: the resident model is shared and the GPU is the bottleneck anyway
+        hilo_rvc = threading.Thread(target=trabajador_rvc, daemon=True)
+        hilo_rvc.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.tts_workers) as pool:
+                pendientes = {pool.submit(self.sintetizar, texto): i for i, (texto, _) in enumerate(trabajos)}
+                for futuro in as_completed(pendientes):
+                    i = pendientes[futuro]
+                    ruta_salida = trabajos[i][1]
+                    try:
+                        audio = futuro.result()
+                    except Exception as e:
+                        resultados[i] = (ruta_salida, False, f"TTS failed: {e}")
+                        print(f"❌ [{i + 1}/{len(trabajos)}] TTS failed: {e}")
+                        continue
+                    if guardar_audio_base:
+                        ruta_base = os.path.splitext(ruta_salida)[0] + "_(base_tts).wav"
+                        sf.write(ruta_base, audio, RVC_SAMPLE_RATE)
+                        print(f"🗣️  [{i + 1}/{len(trabajos)}] Base audio (TTS) saved at: {ruta_base}")
+                    cola_rvc.put((i, audio, ruta_salida))
+        finally:
+            cola_rvc.put(None)
+            hilo_rvc.join()
+        return resultados
 
 # ========================================================================================
 # 🚀 CONFIGURATION SECTION: MODIFY THESE VALUES TO CUSTOMIZE EXECUTION 🚀
 # ========================================================================================
 
 if __name__ == "__main__":
-    # 📝 1. Input text to synthesize
-    texto_a_convertir = "Agus necesita un iphone nuevo.."
+    # 📝 1. Input texts to synthesize (one output file per line)
+    textos_a_convertir = [
+        "Agus necesita un iphone nuevo..",
+    ]
 
     # 🗣️ 2. TTS voice preset
     voz_tts_generica = "es-AR-ElenaNeural"  # or "es-ES-ElviraNeural", "en-US-JennyNeural"
@@ -104,9 +205,13 @@ if __name__ == "__main__":
     ruta_modelo_rel = "../Archivos/Modelos/a.pth"
     ruta_index_rel = "../Archivos/Modelos/a.index"
 
-    # 📁 4. Output filenames for the audio results
-    nombre_audio_base_tts = "audio_para_comparar_(base_tts).wav"
-    nombre_audio_final_rvc = "audio_para_comparar_(final_rvc).wav"
+    # 📁 4. Output filename prefix for the audio results (a line number is appended)
+    nombre_audio_final_rvc = "audio_para_comparar_(final_rvc)"
+    # Also save the TTS audio before RVC, to compare both
+    guardar_audio_base = True
+
+    # ⚡ 5. Parallel TTS downloads (the RVC conversion itself runs one line at a time on the GPU)
+    tts_workers = 4
     
 # ========================================================================================
 # 🛑 DO NOT MODIFY ANYTHING BELOW THIS LINE 🛑
@@ -121,26 +226,33 @@ if __name__ == "__main__":
     # Create output folder if it doesn't exist
     os.makedirs(carpeta_resultados, exist_ok=True)
 
-    # Construct absolute paths for intermediate and final audio files
-    ruta_audio_intermedio_abs = os.path.join(carpeta_resultados, nombre_audio_base_tts)
-    ruta_audio_final_abs = os.path.join(carpeta_resultados, nombre_audio_final_rvc)
-
     # Resolve model and index paths to absolute
     ruta_modelo_abs = os.path.abspath(ruta_modelo_rel)
     ruta_index_abs = os.path.abspath(ruta_index_rel)
     
     print(f"Model path: {ruta_modelo_abs}")
-    print(f"TTS audio will be saved at: {ruta_audio_intermedio_abs}")
-    print(f"Final RVC audio will be saved at: {ruta_audio_final_abs}")
+    print(f"Results will be saved in: {carpeta_resultados}")
+
+    trabajos = [
+        (texto, os.path.join(carpeta_resultados, f"{nombre_audio_final_rvc}_{i + 1:03d}.wav"))
+        for i, texto in enumerate(textos_a_convertir)
+    ]
 
     # --- Execute the Full Pipeline ---
-    ejecutar_conversion_completa(
-        texto=texto_a_convertir,
-        voz_tts_base=voz_tts_generica,
+    print("\n--- 🚀 STARTING FULL PIPELINE (TTS + RVC) ---")
+    servicio = ServicioConversionRVC(
         modelo_rvc=ruta_modelo_abs,
         index_rvc=ruta_index_abs,
-        ruta_tts_intermedio=ruta_audio_intermedio_abs,
-        ruta_salida_final=ruta_audio_final_abs
+        voz_tts_base=voz_tts_generica,
+        tts_workers=tts_workers
     )
+    inicio = time.perf_counter()
+    resultados = servicio.convertir_lote(trabajos, guardar_audio_base=guardar_audio_base)
+    correctos = sum(ok for _, ok, _ in resultados)
+    duracion = time.perf_counter() - inicio
+    print(f"\n⏱️  {correctos}/{len(trabajos)} line(s) converted in {duracion:.1f}s ({duracion / max(1, len(trabajos)):.2f}s per line).")
     
-    print("\n\n🎉 Process completed successfully. 🎉")
+    if correctos == len(trabajos):
+        print("\n\n🎉 Process completed successfully. 🎉")
+    else:
+        print("\n\n⚠️  Some lines failed, see the messages above.")
@@ -0,0 +1,308 @@
+"""
+Microphone capture and speaker playback for the Gemini Live test scripts (test_gemini_live_v2_EN.py / _ES.py).
+
+The input stream runs in callback mode and writes straight into a preallocated ring buffer,
+so nothing is read or allocated per chunk on the asyncio side. Silero VAD runs on every
+32 ms frame that has arrived since the last wake-up, and the user's speech is streamed to
+the live session while it is still being spoken: when the user stops, Gemini already has
+the whole utterance and only needs the end-of-turn signal.
+
+Playback mirrors it: replies are written into a jitter buffer that a callback-mode output
+stream drains, so network hiccups are absorbed by the buffer and a barge-in silences the
+speaker on the next callback (about 20 ms) instead of after the queued audio.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pyaudio
+import torch
+from google.genai import types
+
+VAD_FRAME_SAMPLES = 512  # Silero VAD frame at 16 kHz (32 ms)
+
+
+@dataclass
+class EndpointingPolicy:
+    """
+    When a user turn starts and ends.
+
+    mode "server": Gemini's own activity detection ends the turn; after `silence_timeout_s` of local
+    silence the client stops streaming and sends `audio_stream_end` so the server flushes its buffer.
+    mode "client": automatic activity detection is disabled (see `live_config`) and the client sends
+    explicit activity start/end messages, the end after `silence_timeout_s` of silence.
+    """
+    mode: str = "server"
+    vad_threshold: float = 0.6
+    silence_timeout_s: float = 1.5
+    pre_speech_s: float = 0.3
+    min_speech_s: float = 0.0     # Voiced audio needed before a turn starts (filters out clicks)
+    send_chunk_s: float = 0.1     # Audio is sent in chunks of about this length while the user speaks
+    max_utterance_s: float = 30.0
+
+    def live_config(self):
+        """Entries to merge into the live session config."""
+        return {"realtime_input_config": {"automatic_activity_detection": {"disabled": self.mode == "client"}}}
+
+
+class AudioRing:
+    """
+    Preallocated int16 ring buffer with one writer (the PortAudio callback thread) and one reader.
+    Positions are absolute sample counts; a reader that falls more than `capacity` behind loses the oldest audio.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)  # A view of the callback's bytes, no copy
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:len(samples) - first] = samples[first:]
+        self.written += len(samples)  # Published last, so the reader never sees a half-written chunk
+
+    def read_into(self, position, out):
+        """Copies the samples starting at absolute `position` into `out` (no allocation)."""
+        start = position % self.capacity
+        first = min(len(out), self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        out[first:] = self._buffer[:len(out) - first]
+        return out
+
+    def read(self, start, end):
+        """The samples in [start, end) as a new int16 array (used for the bytes sent to the API)."""
+        return self.read_into(start, np.empty(end - start, dtype=np.int16))
+
+
+class CaptureEngine:
+    """Owns the microphone stream, the ring buffer and the endpointing state of the live session."""
+    def __init__(self, audio, vad_model, policy, rate=16000, max_vad_frames=16):
+        self.vad_model = vad_model
+        self.policy = policy
+        self.rate = rate
+        self.mime_type = f"audio/pcm;rate={rate}"
+        # Enough history for the pre-speech window plus a few seconds of slack for a busy event loop
+        self.ring = AudioRing(int((policy.pre_speech_s + 5.0) * rate))
+        # Scratch buffers for one VAD pass over up to `max_vad_frames` frames, reused on every wake-up
+        self._max_vad_frames = max_vad_frames
+        self._pcm_block = np.zeros(max_vad_frames * VAD_FRAME_SAMPLES, dtype=np.int16)
+        self._float_block = np.zeros(max_vad_frames * VAD_FRAME_SAMPLES, dtype=np.float32)
+        self._float_tensor = torch.from_numpy(self._float_block)  # Shares memory with _float_block
+        self._audio = audio
+        self._stream = None
+        self._loop = None
+        self._data_ready = asyncio.Event()
+        self.overruns = 0
+        self.turns = 0
+
+    def start(self):
+        """Opens the input stream in callback mode. Must be called from the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate, input=True,
+                                        frames_per_buffer=VAD_FRAME_SAMPLES, stream_callback=self._on_audio)
+        self._stream.start_stream()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        # PortAudio thread: copy into the ring and wake the reader, nothing else
+        self.ring.write(in_data)
+        self._loop.call_soon_threadsafe(self._data_ready.set)
+        return None, pyaudio.paContinue
+
+    async def stream_to(self, session, on_speech_start=None, on_speech_end=None):
+        """
+        Runs the endpointing loop forever, streaming each user turn to `session` while it is spoken.
+        `on_speech_start` is called when a turn starts (e.g. to interrupt the assistant), `on_speech_end` when it ends.
+        """
+        policy = self.policy
+        pre_speech = int(policy.pre_speech_s * self.rate)
+        send_chunk = int(policy.send_chunk_s * self.rate)
+        max_silence_frames = int(policy.silence_timeout_s * self.rate / VAD_FRAME_SAMPLES)
+        min_voiced_frames = max(1, int(policy.min_speech_s * self.rate / VAD_FRAME_SAMPLES))
+        max_frames = int(policy.max_utterance_s * self.rate / VAD_FRAME_SAMPLES)
+
+        position = self.ring.written  # Next sample to run through VAD
+        onset = sent = None           # Absolute positions of the turn's first sample and of the next unsent one
+        voiced = silence = frames = 0
+
+        while True:
+            await self._data_ready.wait()
+            self._data_ready.clear()
+            if self.ring.written - position > self.ring.capacity:
+                # The loop was stalled for longer than the ring holds: drop the turn and resume from recent audio
+                self.overruns += 1
+                position = self.ring.written - self.ring.capacity // 2
+                onset = sent = None
+                voiced = silence = frames = 0
+
+            while self.ring.written - position >= VAD_FRAME_SAMPLES:
+                count = min(self._max_vad_frames, (self.ring.written - position) // VAD_FRAME_SAMPLES)
+                samples = count * VAD_FRAME_SAMPLES
+                pcm = self.ring.read_into(position, self._pcm_block[:samples])
+                np.multiply(pcm, 1.0 / 32768.0, out=self._float_block[:samples], casting="unsafe")
+                with torch.no_grad():
+                    for i in range(count):
+                        frame = self._float_tensor[i * VAD_FRAME_SAMPLES:(i + 1) * VAD_FRAME_SAMPLES]
+                        is_speech = self.vad_model(frame, self.rate).item() > policy.vad_threshold
+                        frame_end = position + (i + 1) * VAD_FRAME_SAMPLES
+
+                        if onset is None:
+                            if not is_speech:
+                                continue
+                            onset = max(frame_end - VAD_FRAME_SAMPLES - pre_speech, self.ring.written - self.ring.capacity)
+                            voiced = silence = frames = 0
+                        frames += 1
+                        voiced += is_speech
+                        silence = 0 if is_speech else silence + 1
+
+                        if sent is None and voiced >= min_voiced_frames:
+                            # The turn starts: the pre-speech audio goes out first, straight from the ring
+                            sent = onset
+                            self.turns += 1
+                            if policy.mode == "client":
+                                await session.send_realtime_input(activity_start=types.ActivityStart())
+                            if on_speech_start:
+                                on_speech_start()
+                        elif sent is None and silence > max_silence_frames:
+                            onset = None  # A click or a cough, never confirmed as speech
+
+                        if sent is not None and (silence > max_silence_frames or frames >= max_frames):
+                            await self._send(session, sent, frame_end)
+                            if policy.mode == "client":
+                                await session.send_realtime_input(activity_end=types.ActivityEnd())
+                            else:
+                                await session.send_realtime_input(audio_stream_end=True)
+                            if on_speech_end:
+                                on_speech_end()
+                            onset = sent = None
+                        elif sent is not None and frame_end - sent >= send_chunk:
+                            await self._send(session, sent, frame_end)
+                            sent = frame_end
+                position += samples
+
+    async def _send(self, session, start, end):
+        if end > start:
+            data = self.ring.read(start, end).tobytes()
+            await session.send_realtime_input(audio=types.Blob(data=data, mime_type=self.mime_type))
+
+    def stats(self):
+        return {"turns": self.turns, "overruns": self.overruns,
+                "captured_s": round(self.ring.written / self.rate, 1)}
+
+
+class PlaybackEngine:
+    """
+    Plays the assistant's audio from a jitter buffer. Playback of a reply starts once `jitter_ms` of audio
+    is buffered (and again after an underrun), so short gaps in the stream do not reach the speaker.
+    `flush()` drops everything buffered; audio of the interrupted reply that is still arriving is dropped
+    until `end_of_response()`.
+    """
+    def __init__(self, audio, rate=24000, jitter_ms=150, capacity_s=30.0, callback_ms=20):
+        self.rate = rate
+        self.ring = AudioRing(int(capacity_s * rate))
+        self._target = int(jitter_ms * rate / 1000)
+        self._frames_per_buffer = int(callback_ms * rate / 1000)
+        self._out = np.zeros(self._frames_per_buffer * 4, dtype=np.int16)  # Scratch for one callback
+        self._read = 0
+        self._lock = threading.Lock()  # Shared with the PortAudio callback; only held for a copy
+        self._playing = False          # False while (re)filling the jitter buffer
+        self._draining = False         # The reply has been fully received: play what is left, however short
+        self._in_response = False
+        self._cancelled = False
+        self._audio = audio
+        self._stream = None
+        self.stats_counters = {"responses": 0, "played_s": 0.0, "underruns": 0, "flushes": 0,
+                               "flushed_s": 0.0, "max_buffered_ms": 0.0}
+
+    def start(self):
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate, output=True,
+                                        frames_per_buffer=self._frames_per_buffer, stream_callback=self._on_audio)
+        self._stream.start_stream()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def buffered(self):
+        """Samples waiting to be played."""
+        with self._lock:
+            return self.ring.written - self._read
+
+    async def write(self, data):
+        """Queues reply audio (16-bit PCM), waiting while the buffer is full."""
+        if self._cancelled:
+            return
+        if not self._in_response:
+            self._in_response = True
+            self._draining = False
+            self.stats_counters["responses"] += 1
+        samples = len(data) // 2
+        while self.ring.capacity - self.buffered() < samples:
+            await asyncio.sleep(self._frames_per_buffer / self.rate)
+            if self._cancelled:
+                return
+        with self._lock:
+            self.ring.write(data)
+            buffered_ms = 1000 * (self.ring.written - self._read) / self.rate
+        self.stats_counters["max_buffered_ms"] = max(self.stats_counters["max_buffered_ms"], round(buffered_ms))
+
+    def end_of_response(self):
+        """The server finished the reply: play out the tail without waiting for a full jitter buffer."""
+        self._draining = True
+        self._in_response = False
+        self._cancelled = False
+
+    def flush(self):
+        """Barge-in: silences the speaker now. Returns True if the assistant was speaking (or about to)."""
+        with self._lock:
+            dropped = self.ring.written - self._read
+            self._read = self.ring.written
+            self._playing = False
+        was_speaking = dropped > 0 or self._in_response
+        if was_speaking:
+            self._cancelled = self._in_response
+            self.stats_counters["flushes"] += 1
+            self.stats_counters["flushed_s"] += dropped / self.rate
+        return was_speaking
+
+    async def drain(self, timeout=30.0):
+        """Waits until everything buffered has been played."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.buffered() > 0 and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self._frames_per_buffer / self.rate)
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        # PortAudio thread: copy from the jitter buffer, or play silence while it refills
+        if frame_count > len(self._out):
+            self._out = np.zeros(frame_count, dtype=np.int16)
+        out = self._out[:frame_count]
+        with self._lock:
+            available = self.ring.written - self._read
+            if not self._playing and available and (available >= self._target or self._draining):
+                self._playing = True
+            played = 0
+            if self._playing:
+                played = min(frame_count, available)
+                self.ring.read_into(self._read, out[:played])
+                self._read += played
+                if played < frame_count:
+                    self._playing = False  # Refill the jitter buffer before resuming
+                    if not self._draining:
+                        self.stats_counters["underruns"] += 1
+        out[played:] = 0
+        self.stats_counters["played_s"] += played / self.rate
+        return out.tobytes(), pyaudio.paContinue
+
+    def stats(self):
+        return {name: round(value, 2) if isinstance(value, float) else value
+                for name, value in self.stats_counters.items()}
@@ -8,17 +8,16 @@ Rin Tohsaka from *Fate/stay night*, responding in real-time with natural audio o
 # pip install google-genai pyaudio torch numpy opencv-python mss
 
 import asyncio
-from collections import deque
-import os
+import re
 from pathlib import Path
 import sys
 import pyaudio
 import torch
-import numpy as np
 import cv2
 import mss
 from google import genai
 from google.genai import types
+from live_audio import CaptureEngine, EndpointingPolicy, PlaybackEngine
 
 # --- CONFIGURATION & PERSONALITY SETUP ---
 
@@ -60,86 +59,62 @@ CONFIG = {
 }
 
 # --- AUDIO & VAD CONSTANTS ---
-FORMAT = pyaudio.paInt16
-INPUT_CHANNELS = 1
 INPUT_RATE = 16000
-OUTPUT_CHANNELS = 1
 OUTPUT_RATE = 24000
-CHUNK_FRAMES = 512
+# Reply audio buffered before playback starts; absorbs network jitter at the cost of this much latency
+JITTER_BUFFER_MS = 150
 VAD_THRESHOLD = 0.6
 SILENCE_TIMEOUT_S = 1.5
 PRE_SPEECH_BUFFER_S = 0.3
+# "server": Gemini detects the end of the turn itself; "client": our VAD ends it after SILENCE_TIMEOUT_S
+ENDPOINTING = "server"
+ENDPOINTING_POLICY = EndpointingPolicy(mode=ENDPOINTING, vad_threshold=VAD_THRESHOLD,
+                                       silence_timeout_s=SILENCE_TIMEOUT_S, pre_speech_s=PRE_SPEECH_BUFFER_S)
 
 
 # --- MAIN ASYNC LOGIC ---
 
-async def handle_user_input(session, audio_stream, vad_model, user_is_interrupting_event):
-    """Continuously listens to the user, records speech, and sends audio input to the API."""
-    pre_speech_buffer_size = int(PRE_SPEECH_BUFFER_S * INPUT_RATE / CHUNK_FRAMES)
-    pre_speech_buffer = deque(maxlen=pre_speech_buffer_size)
-    speech_buffer = bytearray()
-    
-    is_speaking = False
-    silence_frames = 0
-    max_silence_frames = int(SILENCE_TIMEOUT_S * INPUT_RATE / CHUNK_FRAMES)
+async def handle_user_input(session, capture, playback):
+    """Continuously listens to the user and streams their speech to the API while they are still talking."""
+    def on_speech_start():
+        print("🎤 Voice detected! Streaming to Rin...")
+        if playback.flush():  # Barge-in: Rin stops talking right away
+            print("🤖 H-Hey! Don't interrupt me, baka!")
+
+    def on_speech_end():
+        print("🎤 Silence detected. Rin already has your input.")
 
     while True:
         try:
-            audio_chunk_bytes = await asyncio.to_thread(audio_stream.read, CHUNK_FRAMES, exception_on_overflow=False)
-            
-            audio_chunk_np = np.frombuffer(audio_chunk_bytes, dtype=np.int16)
-            audio_chunk_tensor = torch.from_numpy(audio_chunk_np).to(torch.float32) / 32768.0
-            speech_prob = vad_model(audio_chunk_tensor, INPUT_RATE).item()
-            is_speech_chunk = speech_prob > VAD_THRESHOLD
-
-            if is_speaking:
-                speech_buffer.extend(audio_chunk_bytes)
-                if is_speech_chunk:
-                    silence_frames = 0
-                else:
-                    silence_frames += 1
-                    if silence_frames > max_silence_frames:
-                        print("🎤 Silence detected. Sending input to Rin...")
-                        if speech_buffer:
-                            await session.send_realtime_input(audio=types.Blob(data=bytes(speech_buffer), mime_type=f"audio/pcm;rate={INPUT_RATE}"))
-                        speech_buffer.clear()
-                        is_speaking = False
-            else:
-                if is_speech_chunk:
-                    print("🎤 Voice detected! Recording...")
-                    is_speaking = True
-                    user_is_interrupting_event.set()  # Flag to interrupt AI response if talking
-
-                    buffered_audio = b''.join(list(pre_speech_buffer))
-                    speech_buffer.extend(buffered_audio)
-                    speech_buffer.extend(audio_chunk_bytes)
-                else:
-                    pre_speech_buffer.append(audio_chunk_bytes)
+            await capture.stream_to(session, on_speech_start, on_speech_end)
         except Exception as e:
             print(f"Error in handle_user_input: {e}")
             await asyncio.sleep(0.1)
 
-async def handle_bot_output(session, audio_stream, user_is_interrupting_event):
-    """Receives the AI response, plays it through speakers, and manages interruptions."""
+async def handle_bot_output(session, playback):
+    """Receives the AI response, plays it through the jitter buffer, and manages interruptions. Returns when the user says goodbye."""
     while True:
         full_transcript = ""
         try:
             async for response in session.receive():
-                if user_is_interrupting_event.is_set():
-                    print("🤖 H-Hey! Don't interrupt me, baka!")
-                    user_is_interrupting_event.clear()
-                    break
-                
+                server_content = response.server_content
+                if server_content and server_content.interrupted:
+                    # The server noticed the user talking before our VAD did
+                    playback.flush()
+
                 if response.data:
-                    await asyncio.to_thread(audio_stream.write, response.data)
-                
+                    # Dropped after a barge-in, until the interrupted reply ends
+                    await playback.write(response.data)
+
                 if response.text:
                     full_transcript += response.text
                     print(f"Rin: {response.text}")
+            playback.end_of_response()
 
-            if "goodbye" in full_transcript.lower() or "bye" in full_transcript.lower():
+            if re.search(r"\b(goodbye|bye)\b", full_transcript.lower()):
+                await playback.drain()
                 print("\n👋 I guess that's it. Don't get into trouble, okay?")
-                os._exit(0)
+                return
 
         except Exception as e:
             await asyncio.sleep(0.1)
@@ -154,26 +129,28 @@ async def main():
         return
 
     p = pyaudio.PyAudio()
-    input_stream = p.open(format=FORMAT, channels=INPUT_CHANNELS, rate=INPUT_RATE, input=True, frames_per_buffer=CHUNK_FRAMES)
-    output_stream = p.open(format=FORMAT, channels=OUTPUT_CHANNELS, rate=OUTPUT_RATE, output=True)
+    capture = CaptureEngine(p, vad_model, ENDPOINTING_POLICY, rate=INPUT_RATE)
+    playback = PlaybackEngine(p, rate=OUTPUT_RATE, jitter_ms=JITTER_BUFFER_MS)
     
     try:
-        async with client.aio.live.connect(model=MODEL, config=CONFIG) as session:
+        async with client.aio.live.connect(model=MODEL, config={**CONFIG, **ENDPOINTING_POLICY.live_config()}) as session:
+            capture.start()
+            playback.start()
             print("\n✨ Alright, listen up! I am Rin Tohsaka. Don't waste my time. What do you want? ✨")
             
-            user_is_interrupting_event = asyncio.Event()
-
-            await asyncio.gather(
-                handle_user_input(session, input_stream, vad_model, user_is_interrupting_event),
-                handle_bot_output(session, output_stream, user_is_interrupting_event)
-            )
+            input_task = asyncio.create_task(handle_user_input(session, capture, playback))
+            output_task = asyncio.create_task(handle_bot_output(session, playback))
+            # The conversation ends when the reply loop returns (goodbye); then the microphone loop is stopped
+            await asyncio.wait([input_task, output_task], return_when=asyncio.FIRST_COMPLETED)
+            input_task.cancel()
+            output_task.cancel()
 
     finally:
         print("Closing audio streams...")
-        input_stream.stop_stream()
-        input_stream.close()
-        output_stream.stop_stream()
-        output_stream.close()
+        capture.close()
+        print(f"🎙️ Capture: {capture.stats()}")
+        playback.close()
+        print(f"🔊 Playback: {playback.stats()}")
         p.terminate()
 
 if __name__ == "__main__":
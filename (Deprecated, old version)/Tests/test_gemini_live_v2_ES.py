@@ -2,17 +2,16 @@
 # pip install google-genai pyaudio torch numpy opencv-python mss
 
 import asyncio
-from collections import deque
-import os
+import re
 from pathlib import Path
 import sys
 import pyaudio
 import torch
-import numpy as np
 import cv2
 import mss
 from google import genai
 from google.genai import types
+from live_audio import CaptureEngine, EndpointingPolicy, PlaybackEngine
 
 # --- CONFIGURACIÓN Y PERSONALIDAD ---
 
@@ -53,94 +52,66 @@ CONFIG = {
 }
 
 # --- CONSTANTES DE AUDIO Y VAD ---
-FORMAT = pyaudio.paInt16
-INPUT_CHANNELS = 1
 INPUT_RATE = 16000
-OUTPUT_CHANNELS = 1
 OUTPUT_RATE = 24000
-CHUNK_FRAMES = 512
+# Audio acumulado antes de empezar a reproducir; absorbe el jitter de la red a costa de esta latencia
+JITTER_BUFFER_MS = 150
 VAD_THRESHOLD = 0.6
 SILENCE_TIMEOUT_S = 1.5
 PRE_SPEECH_BUFFER_S = 0.3
+# "server": Gemini detecta el fin del turno; "client": nuestro VAD lo termina tras SILENCE_TIMEOUT_S
+ENDPOINTING = "server"
+ENDPOINTING_POLICY = EndpointingPolicy(mode=ENDPOINTING, vad_threshold=VAD_THRESHOLD,
+                                       silence_timeout_s=SILENCE_TIMEOUT_S, pre_speech_s=PRE_SPEECH_BUFFER_S)
 
 
 # --- LÓGICA PRINCIPAL ASÍNCRONA ---
 
-async def handle_user_input(session, audio_stream, vad_model, user_is_interrupting_event):
-    """Escucha constantemente al usuario, graba su voz y envía el contenido a la API."""
-    pre_speech_buffer_size = int(PRE_SPEECH_BUFFER_S * INPUT_RATE / CHUNK_FRAMES)
-    pre_speech_buffer = deque(maxlen=pre_speech_buffer_size)
-    speech_buffer = bytearray()
-    
-    is_speaking = False
-    silence_frames = 0
-    max_silence_frames = int(SILENCE_TIMEOUT_S * INPUT_RATE / CHUNK_FRAMES)
+async def handle_user_input(session, capture, playback):
+    """Escucha constantemente al usuario y envía su voz a la API mientras todavía está hablando."""
+    def on_speech_start():
+        print("🎤 ¡Voz detectada! Enviando...")
+        if playback.flush(): # Interrupción: Rin deja de hablar en el acto
+            print("🤖 ¡B-baka! No me interrumpas así...")
+
+    def on_speech_end():
+        # Fin del turno del usuario: el audio ya fue enviado mientras hablaba
+        print("🎤 Silencio detectado. Procesando tu petición...")
 
     while True:
         try:
-            audio_chunk_bytes = await asyncio.to_thread(audio_stream.read, CHUNK_FRAMES, exception_on_overflow=False)
-            
-            audio_chunk_np = np.frombuffer(audio_chunk_bytes, dtype=np.int16)
-            audio_chunk_tensor = torch.from_numpy(audio_chunk_np).to(torch.float32) / 32768.0
-            speech_prob = vad_model(audio_chunk_tensor, INPUT_RATE).item()
-            is_speech_chunk = speech_prob > VAD_THRESHOLD
-
-            if is_speaking:
-                speech_buffer.extend(audio_chunk_bytes)
-                if is_speech_chunk:
-                    silence_frames = 0
-                else:
-                    silence_frames += 1
-                    if silence_frames > max_silence_frames:
-                        # Fin del turno del usuario, enviar todo
-                        print("🎤 Silencio detectado. Procesando tu petición...")
-                        if speech_buffer:
-                            await session.send_realtime_input(audio=types.Blob(data=bytes(speech_buffer), mime_type=f"audio/pcm;rate={INPUT_RATE}"))
-                        speech_buffer.clear()
-                        is_speaking = False
-            else:
-                if is_speech_chunk:
-                    print("🎤 ¡Voz detectada! Grabando...")
-                    is_speaking = True
-                    user_is_interrupting_event.set() # Señal para interrumpir a la IA si está hablando
-                    
-                    buffered_audio = b''.join(list(pre_speech_buffer))
-                    speech_buffer.extend(buffered_audio)
-                    speech_buffer.extend(audio_chunk_bytes)
-                else:
-                    pre_speech_buffer.append(audio_chunk_bytes)
+            await capture.stream_to(session, on_speech_start, on_speech_end)
         except Exception as e:
             print(f"Error en handle_user_input: {e}")
             await asyncio.sleep(0.1)
 
-async def handle_bot_output(session, audio_stream, user_is_interrupting_event):
-    """Recibe la respuesta de la IA, la reproduce y maneja las interrupciones."""
+async def handle_bot_output(session, playback):
+    """Recibe la respuesta de la IA, la reproduce desde el buffer de jitter y maneja las interrupciones. Termina cuando el usuario se despide."""
     while True:
         full_transcript = ""
         try:
             async for response in session.receive():
-                if user_is_interrupting_event.is_set():
-                    print("🤖 ¡B-baka! No me interrumpas así...")
-                    # Limpia el evento para la próxima vez
-                    user_is_interrupting_event.clear()
-                    # Rompe el bucle para dejar de reproducir esta respuesta
-                    break
-                
+                server_content = response.server_content
+                if server_content and server_content.interrupted:
+                    # El servidor detectó que el usuario habla antes que nuestro VAD
+                    playback.flush()
+
                 if response.data:
-                    await asyncio.to_thread(audio_stream.write, response.data)
-                
+                    # Se descarta tras una interrupción, hasta que termina la respuesta interrumpida
+                    await playback.write(response.data)
+
                 if response.text:
                     full_transcript += response.text
                     print(f"Rin: {response.text}")
-            
-            # Revisa la transcripción completa al final de la respuesta
-            if "adiós" in full_transcript.lower() or "chau" in full_transcript.lower():
+            playback.end_of_response()
+
+            if re.search(r"\b(adiós|chau)\b", full_transcript.lower()):
+                await playback.drain()
                 print("\n👋 Supongo que esto es todo. No te metas en problemas.")
-                os._exit(0) # Cierra el programa
+                return
 
         except Exception as e:
-            #print(f"Error en handle_bot_output: {e}")
-            await asyncio.sleep(0.1) # Evita un bucle de error muy rápido
+            await asyncio.sleep(0.1)
 
 async def main():
     """Función principal que inicializa y coordina todo."""
@@ -152,27 +123,28 @@ async def main():
         return
 
     p = pyaudio.PyAudio()
-    input_stream = p.open(format=FORMAT, channels=INPUT_CHANNELS, rate=INPUT_RATE, input=True, frames_per_buffer=CHUNK_FRAMES)
-    output_stream = p.open(format=FORMAT, channels=OUTPUT_CHANNELS, rate=OUTPUT_RATE, output=True)
+    capture = CaptureEngine(p, vad_model, ENDPOINTING_POLICY, rate=INPUT_RATE)
+    playback = PlaybackEngine(p, rate=OUTPUT_RATE, jitter_ms=JITTER_BUFFER_MS)
     
     try:
-        async with client.aio.live.connect(model=MODEL, config=CONFIG) as session:
+        async with client.aio.live.connect(model=MODEL, config={**CONFIG, **ENDPOINTING_POLICY.live_config()}) as session:
+            capture.start()
+            playback.start()
             print("\n✨ ¡Muy bien, escucha! Soy Rin Tohsaka. No me hagas perder el tiempo. ¿Qué necesitas? ✨")
             
-            user_is_interrupting_event = asyncio.Event()
-
-            # Ejecuta las dos tareas principales en paralelo
-            await asyncio.gather(
-                handle_user_input(session, input_stream, vad_model, user_is_interrupting_event),
-                handle_bot_output(session, output_stream, user_is_interrupting_event)
-            )
+            input_task = asyncio.create_task(handle_user_input(session, capture, playback))
+            output_task = asyncio.create_task(handle_bot_output(session, playback))
+            # La conversación termina cuando el bucle de respuestas retorna (despedida); luego se detiene el micrófono
+            await asyncio.wait([input_task, output_task], return_when=asyncio.FIRST_COMPLETED)
+            input_task.cancel()
+            output_task.cancel()
 
     finally:
         print("Cerrando streams de audio...")
-        input_stream.stop_stream()
-        input_stream.close()
-        output_stream.stop_stream()
-        output_stream.close()
+        capture.close()
+        print(f"🎙️ Capture: {capture.stats()}")
+        playback.close()
+        print(f"🔊 Playback: {playback.stats()}")
         p.terminate()
 
 if __name__ == "__main__":
@@ -0,0 +1,554 @@
+"""
+Offline load test for the voice pipeline in `main.ipynb`.
+
+Runs the server cells of the notebook outside Colab (no network, no ngrok), replays a corpus of
+recorded utterances against the HTTP endpoints at a given concurrency and reports throughput,
+p50/p95/p99 end-to-end latency, time to first audio (reply audio served by URL is downloaded, as a
+browser would), per-stage latency (from the server's request log), reply audio size and peak RSS/VRAM.
+
+Gemini is always replaced by a local stand-in (see `standins.py`). Whisper, MeloTTS and OpenVoice
+are replaced by lightweight stand-ins unless `--real-models` is given, in which case the real
+packages (and `--openvoice-dir` with the `checkpoints_v2` folder) must be available.
+
+`--endpoint voice_channel` streams each utterance as 16 kHz PCM over the WebSocket voice channel
+instead; its latencies are measured from the end of the utterance (VAD silence timeout included).
+
+Examples:
+    python benchmarks/bench_voice_pipeline.py --requests 40 --concurrency 4
+    python benchmarks/bench_voice_pipeline.py --endpoint voice_channel --realtime
+    python benchmarks/bench_voice_pipeline.py --endpoint /process_audio --json run.json
+    python benchmarks/bench_voice_pipeline.py --baseline run.json --tolerance 0.15
+    python benchmarks/bench_voice_pipeline.py --set ASR_MAX_BATCH_SIZE=1 --set MIN_SENTENCE_CHARS=40
+
+Corpus files are uploaded as-is; `.pcm` files are sent as raw 16 kHz mono int16 (`audio/pcm`).
+
+Requirements (stand-in mode): numpy, torch (CPU is fine), soundfile, librosa, av, flask, flask-cors,
+waitress and websockets.
+"""
+import argparse
+import base64
+import dataclasses
+import http.client
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import standins
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTEBOOK_PATH = os.path.join(REPO_ROOT, "main.ipynb")
+ASSETS_DIR = os.path.join(REPO_ROOT, "assets")
+RUN_MARKER = "Run the Application"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".webm", ".ogg", ".m4a", ".flac", ".pcm")
+MIME_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".webm": "audio/webm", ".ogg": "audio/ogg",
+              ".m4a": "audio/mp4", ".flac": "audio/flac", ".pcm": "audio/pcm;rate=16000;channels=1"}
+REPORTED_PERCENTILES = (50, 95, 99)
+VOICE_CHANNEL = "voice_channel"
+PCM_BLOCK_SAMPLES = 1024 # Same block size as the browser client
+
+
+# --- 1. NOTEBOOK LOADING ---
+
+def load_server_cells(notebook_path):
+    """Returns the source of every code cell after the 'Run the Application' heading."""
+    with open(notebook_path, encoding="utf-8") as f:
+        cells = json.load(f)["cells"]
+    for start, cell in enumerate(cells):
+        if cell["cell_type"] == "markdown" and RUN_MARKER in "".join(cell["source"]):
+            break
+    else:
+        raise RuntimeError(f"No '{RUN_MARKER}' heading found in {notebook_path}")
+    return ["".join(c["source"]) for c in cells[start + 1:] if c["cell_type"] == "code"]
+
+
+def prepare_cell(source, workdir, overrides):
+    """Rewrites a notebook cell so it runs as plain Python inside `workdir`."""
+    source = source.replace("/content", workdir)
+    for name, value in overrides.items():
+        source, count = re.subn(rf"^{re.escape(name)}\s*=.*$", f"{name} = {value}", source, flags=re.M)
+        if count:
+            overrides[name] = None  # Mark as applied
+    lines = []
+    for line in source.split("\n"):
+        stripped = line.lstrip()
+        indent = line[:len(line) - len(stripped)]
+        if stripped.startswith("%cd "):
+            line = f"{indent}os.chdir({stripped[4:].strip()!r})"
+        elif stripped.startswith(("!", "%")):
+            line = f"{indent}pass"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def prepare_workdir(workdir, real_models, openvoice_dir):
+    """Lays out the files the notebook expects under /content."""
+    shutil.copy(os.path.join(ASSETS_DIR, "cliente_final.html"), workdir)
+    shutil.copy(os.path.join(ASSETS_DIR, "reference.mp3"), workdir)
+    if real_models:
+        os.symlink(os.path.abspath(openvoice_dir), os.path.join(workdir, "OpenVoice"))
+        return
+    import torch
+    checkpoints = os.path.join(workdir, "OpenVoice", "checkpoints_v2")
+    os.makedirs(os.path.join(checkpoints, "converter"))
+    os.makedirs(os.path.join(checkpoints, "base_speakers", "ses"))
+    with open(os.path.join(checkpoints, "converter", "config.json"), "w") as f:
+        json.dump({}, f)
+    with open(os.path.join(checkpoints, "converter", "checkpoint.pth"), "wb") as f:
+        f.write(b"stand-in checkpoint")
+    for speaker in ("en-us", "es"):
+        torch.save(torch.zeros(1, 256, 1), os.path.join(checkpoints, "base_speakers", "ses", f"{speaker}.pth"))
+
+
+def start_server(cells, workdir, overrides, server_threads):
+    """Executes the notebook cells and returns (namespace, port) once Waitress is listening."""
+    import waitress
+    from waitress.server import create_server
+
+    started = threading.Event()
+    server_info = {}
+
+    def serve_in_background(app, host="0.0.0.0", port=5000, **kwargs):
+        server = create_server(app, host="127.0.0.1", port=0, threads=server_threads)
+        server_info["server"] = server
+        threading.Thread(target=server.run, daemon=True).start()
+        started.set()
+
+    original_serve = waitress.serve
+    waitress.serve = serve_in_background
+    namespace = {"__name__": "__main__"}
+    try:
+        for index, source in enumerate(cells):
+            code = compile(prepare_cell(source, workdir, overrides), f"main.ipynb[server cell {index}]", "exec")
+            exec(code, namespace)
+    finally:
+        waitress.serve = original_serve
+    unknown = [name for name, value in overrides.items() if value is not None]
+    if unknown:
+        raise SystemExit(f"❌ --set names not found in the notebook: {', '.join(unknown)}")
+    if not started.wait(timeout=5):
+        raise RuntimeError("The notebook finished without calling serve()")
+    return namespace, server_info["server"].effective_port
+
+
+def wait_until_ready(port, timeout):
+    """
+    Polls /ready until the notebook reports its models loaded and warmed up, and returns that status
+    (None for notebooks without a readiness endpoint).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        try:
+            connection.request("GET", "/ready")
+            response = connection.getresponse()
+            body = response.read()
+        finally:
+            connection.close()
+        if response.status == 404:
+            return None
+        if response.status == 200:
+            return json.loads(body)
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"The server was not ready after {timeout:.0f}s: {body[:200]!r}")
+        time.sleep(0.2)
+
+
+# --- 2. LOAD GENERATION ---
+
+def load_corpus(paths):
+    corpus = []
+    for path in paths:
+        files = [os.path.join(path, f) for f in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+        for file_path in files:
+            extension = os.path.splitext(file_path)[1].lower()
+            if extension in AUDIO_EXTENSIONS:
+                with open(file_path, "rb") as f:
+                    corpus.append((os.path.basename(file_path), f.read(), MIME_TYPES[extension]))
+    if not corpus:
+        raise SystemExit("❌ The corpus contains no audio files")
+    return corpus
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode()
+    for name, (filename, data, mime_type) in files.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: {mime_type}\r\n\r\n').encode()
+        body += data + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+def fetch_reply_audio(port, event, timeout):
+    """Returns the size of an 'audio' event's reply, downloading it first when the event only carries its URL."""
+    if "audio_url" not in event:
+        return len(base64.b64decode(event["audio"]))
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request("GET", event["audio_url"])
+        response = connection.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"GET {event['audio_url']} returned {response.status}")
+        return len(payload)
+    finally:
+        connection.close()
+
+
+def send_utterance(port, endpoint, session_id, utterance, voice, timeout):
+    """Posts one utterance and returns a result dict with timings in seconds."""
+    filename, data, mime_type = utterance
+    fields = {"voice": voice} if voice else {}
+    body, content_type = encode_multipart(fields, {"audio": (filename, data, mime_type)})
+    result = {"endpoint": endpoint, "utterance": filename, "first_audio": None, "audio_chunks": 0, "audio_bytes": 0,
+              "error": None}
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request("POST", endpoint, body=body,
+                           headers={"Content-Type": content_type, "X-Session-Id": session_id})
+        response = connection.getresponse()
+        result["status"] = response.status
+        if response.status == 200 and endpoint.endswith("_stream"):
+            for line in iter(response.readline, b""):
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["type"] == "audio":
+                    result["audio_chunks"] += 1
+                    result["audio_bytes"] += fetch_reply_audio(port, event, timeout)
+                    if result["first_audio"] is None:
+                        result["first_audio"] = time.perf_counter() - started
+                elif event["type"] == "error":
+                    result["error"] = event.get("error", "error event")
+        else:
+            payload = response.read()
+            if response.status == 200:
+                result["first_audio"] = time.perf_counter() - started
+                result["audio_chunks"] = 1
+                result["audio_bytes"] = len(payload)
+            else:
+                result["error"] = payload[:200].decode("utf-8", "replace")
+    except Exception as e:
+        result["status"] = None
+        result["error"] = repr(e)
+    finally:
+        connection.close()
+    result["end_to_end"] = time.perf_counter() - started
+    return result
+
+
+def stream_utterance(port, ws_port, session_id, utterance, voice, timeout, trailing_silence_s, realtime):
+    """
+    Streams one utterance (int16 PCM bytes) over the voice channel followed by enough silence for the
+    server's VAD to end it. Timings start when the last speech block has been sent.
+    Reply audio served by URL is downloaded from the HTTP server on `port`.
+    """
+    from websockets.sync.client import connect
+
+    filename, pcm = utterance
+    block_bytes = 2 * PCM_BLOCK_SAMPLES
+    block_seconds = PCM_BLOCK_SAMPLES / 16000
+    silence = bytes(2 * int(trailing_silence_s * 16000))
+    result = {"endpoint": VOICE_CHANNEL, "utterance": filename, "first_audio": None, "audio_chunks": 0,
+              "audio_bytes": 0, "error": None, "status": None}
+    started = time.perf_counter()
+    try:
+        with connect(f"ws://127.0.0.1:{ws_port}", open_timeout=timeout) as websocket:
+            websocket.send(json.dumps({"type": "start", "session_id": session_id, "voice": voice}))
+            for stream_bytes, mark_end in ((pcm, True), (silence, False)):
+                for offset in range(0, len(stream_bytes), block_bytes):
+                    websocket.send(stream_bytes[offset:offset + block_bytes])
+                    if realtime:
+                        time.sleep(block_seconds)
+                if mark_end:
+                    started = time.perf_counter()
+            while True:
+                event = json.loads(websocket.recv(timeout=timeout))
+                if event["type"] == "audio":
+                    result["audio_chunks"] += 1
+                    result["audio_bytes"] += fetch_reply_audio(port, event, timeout)
+                    if result["first_audio"] is None:
+                        result["first_audio"] = time.perf_counter() - started
+                elif event["type"] == "done":
+                    result["status"] = 200
+                    break
+                elif event["type"] == "busy":
+                    result["status"] = 429
+                    break
+                elif event["type"] == "error":
+                    result["status"] = 500
+                    result["error"] = event.get("error", "error event")
+                    break
+    except Exception as e:
+        result["error"] = repr(e)
+    result["end_to_end"] = time.perf_counter() - started
+    return result
+
+
+def run_load(port, endpoints, corpus, requests_count, concurrency, voice, timeout, voice_channel=None):
+    """
+    Replays the corpus with `concurrency` virtual users, each with its own session.
+    `voice_channel` holds (ws_port, pcm_corpus, trailing_silence_s, realtime) when that endpoint is used.
+    """
+    def virtual_user(user_index):
+        session_id = f"bench-{user_index}-{uuid.uuid4().hex[:8]}"
+        results = []
+        for n in range(user_index, requests_count, concurrency):
+            endpoint = endpoints[n % len(endpoints)]
+            if endpoint == VOICE_CHANNEL:
+                ws_port, pcm_corpus, trailing_silence_s, realtime = voice_channel
+                results.append(stream_utterance(port, ws_port, session_id, pcm_corpus[n % len(pcm_corpus)], voice,
+                                                timeout, trailing_silence_s, realtime))
+            else:
+                results.append(send_utterance(port, endpoint, session_id, corpus[n % len(corpus)], voice, timeout))
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        per_user = list(pool.map(virtual_user, range(concurrency)))
+    return [r for results in per_user for r in results], time.perf_counter() - started
+
+
+# --- 3. REPORTING ---
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(values):
+    if not values:
+        return None
+    summary = {f"p{q}": round(percentile(values, q) * 1000, 1) for q in REPORTED_PERCENTILES}
+    summary["mean"] = round(sum(values) / len(values) * 1000, 1)
+    summary["count"] = len(values)
+    return summary
+
+
+def read_stage_latencies(log_path, request_ids):
+    """Groups `span` durations from the server's JSON-lines request log by stage."""
+    stages = {}
+    if not os.path.exists(log_path):
+        return stages
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("event") == "span" and entry.get("request_id") in request_ids:
+                stages.setdefault(entry["stage"], []).append(entry["duration_ms"] / 1000.0)
+    return stages
+
+
+def read_asr_tiers(log_path, request_ids):
+    """Counts the Whisper tier of every transcript in the server's request log."""
+    tiers = Counter()
+    if not os.path.exists(log_path):
+        return tiers
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("event") == "transcript" and entry.get("request_id") in request_ids:
+                tiers[entry.get("tier")] += 1
+    return tiers
+
+
+def read_request_ids(log_path):
+    if not os.path.exists(log_path):
+        return set()
+    with open(log_path, encoding="utf-8") as f:
+        return {json.loads(line).get("request_id") for line in f}
+
+
+def peak_memory():
+    """Peak RSS of this process (server and load generator share it) and peak CUDA memory, in MB."""
+    import torch
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if sys.platform == "darwin":
+        rss_mb /= 1024  # ru_maxrss is in bytes on macOS
+    vram_mb = torch.cuda.max_memory_allocated() / 2**20 if torch.cuda.is_available() else None
+    return round(rss_mb, 1), None if vram_mb is None else round(vram_mb, 1)
+
+
+def build_report(results, wall_seconds, log_path, warmup_request_ids, config):
+    ok = [r for r in results if r["status"] == 200 and not r["error"]]
+    rejected = [r for r in results if r["status"] == 429]
+    failed = [r for r in results if r not in ok and r not in rejected]
+    latency = {
+        "end_to_end": summarize([r["end_to_end"] for r in ok]),
+        "first_audio": summarize([r["first_audio"] for r in ok if r["first_audio"] is not None]),
+    }
+    request_ids = read_request_ids(log_path) - warmup_request_ids
+    for stage, durations in sorted(read_stage_latencies(log_path, request_ids).items()):
+        latency[f"stage:{stage}"] = summarize(durations)
+    rss_mb, vram_mb = peak_memory()
+    return {
+        "config": config,
+        "requests": {"ok": len(ok), "rejected": len(rejected), "failed": len(failed)},
+        "errors": sorted({str(r["error"]) for r in failed})[:5],
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_ms": {name: value for name, value in latency.items() if value},
+        "asr_tiers": dict(read_asr_tiers(log_path, request_ids).most_common()),
+        "reply_audio_kb": round(sum(r["audio_bytes"] for r in ok) / len(ok) / 1024, 1) if ok else None,
+        "peak_rss_mb": rss_mb,
+        "peak_vram_mb": vram_mb,
+    }
+
+
+def print_report(report):
+    requests = report["requests"]
+    print("\n" + "=" * 72)
+    print(f"📊 {requests['ok']} ok, {requests['rejected']} rejected (429), {requests['failed']} failed "
+          f"in {report['wall_seconds']} s → {report['throughput_rps']} req/s")
+    for error in report["errors"]:
+        print(f"   ❌ {error}")
+    print(f"{'latency (ms)':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}{'n':>6}")
+    for name, s in report["latency_ms"].items():
+        print(f"{name:<28}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}{s['mean']:>10}{s['count']:>6}")
+    if report.get("asr_tiers"):
+        print("🎙️ ASR tiers: " + ", ".join(f"{tier} {count}" for tier, count in report["asr_tiers"].items()))
+    print(f"📦 Reply audio: {report['reply_audio_kb']} KB per request")
+    if report.get("startup"):
+        breakdown = ", ".join(f"{name} {model.get('load_s', 0)}+{model.get('warmup_s', 0)}s"
+                              for name, model in report["startup"]["models"].items())
+        print(f"🚀 Cold start: ready after {report['startup']['ready_after_s']}s (load+warm-up: {breakdown})")
+    vram = "n/a" if report["peak_vram_mb"] is None else f"{report['peak_vram_mb']} MB"
+    print(f"🧠 Peak RSS: {report['peak_rss_mb']} MB | Peak VRAM: {vram}")
+    print("=" * 72)
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Returns a list of regressions: p95 latencies that grew, or throughput that dropped, by more than `tolerance`."""
+    regressions = []
+    for name, current in report["latency_ms"].items():
+        previous = baseline.get("latency_ms", {}).get(name)
+        if previous and current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append(f"{name} p95 {previous['p95']} → {current['p95']} ms")
+    if report["throughput_rps"] < baseline.get("throughput_rps", 0) * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_rps']} → {report['throughput_rps']} req/s")
+    return regressions
+
+
+# --- 4. ENTRY POINT ---
+
+def parse_bool(value):
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--corpus", nargs="+", default=[os.path.join(ASSETS_DIR, "reference.mp3")],
+                        help="Audio files or folders to replay (default: assets/reference.mp3)")
+    parser.add_argument("--endpoint", action="append", choices=["/process_audio", "/process_audio_stream", VOICE_CHANNEL],
+                        help="Endpoint(s) to hit, alternating between them (default: /process_audio_stream)")
+    parser.add_argument("--requests", type=int, default=20, help="Total number of measured requests")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent virtual users (sessions)")
+    parser.add_argument("--warmup-requests", type=int, default=2, help="Unmeasured requests sent before the run")
+    parser.add_argument("--realtime", action="store_true", help="Pace voice channel audio at real-time speed")
+    parser.add_argument("--voice", default=None, help="Voice name sent with every request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--server-threads", type=int, default=8, help="Waitress worker threads")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a notebook parameter (a Python expression), e.g. --set MAX_CONCURRENT_GPU_JOBS=2")
+    parser.add_argument("--real-models", action="store_true", help="Use the real Whisper/MeloTTS/OpenVoice packages")
+    parser.add_argument("--openvoice-dir", help="OpenVoice checkout with checkpoints_v2 (required with --real-models)")
+    for field in dataclasses.fields(standins.StandInConfig):
+        value_type = parse_bool if field.type is bool else field.type
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=value_type, default=field.default,
+                            help=f"Stand-in latency model (default: {field.default})")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --json report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression vs. the baseline (0.10 = 10%%)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Do not delete the temporary working directory")
+    args = parser.parse_args()
+    if args.real_models and not args.openvoice_dir:
+        parser.error("--real-models requires --openvoice-dir")
+    return args
+
+
+def main():
+    args = parse_args()
+    endpoints = args.endpoint or ["/process_audio_stream"]
+    overrides = dict(item.split("=", 1) for item in args.set)
+    overrides.setdefault("VOICE_CHANNEL_PORT", "0") # Any free port, so runs never collide
+    config = standins.StandInConfig(**{f.name: getattr(args, f.name) for f in dataclasses.fields(standins.StandInConfig)})
+    corpus = load_corpus(args.corpus)
+
+    workdir = tempfile.mkdtemp(prefix="voice-bench-")
+    try:
+        print(f"🧪 Working directory: {workdir}")
+        standins.install(config, real_models=args.real_models)
+        prepare_workdir(workdir, args.real_models, args.openvoice_dir)
+        namespace, port = start_server(load_server_cells(NOTEBOOK_PATH), workdir, overrides, args.server_threads)
+        log_path = namespace["REQUEST_LOG_PATH"]
+        print(f"✅ Server listening on 127.0.0.1:{port}")
+        startup = wait_until_ready(port, args.timeout)
+        if startup:
+            print(f"✅ Models ready after {startup['ready_after_s']}s")
+        voice_channel = None
+        if VOICE_CHANNEL in endpoints:
+            import numpy as np
+            pcm_corpus = [(name, (np.clip(namespace["decode_upload"](data, mime_type), -1, 1) * 32767).astype("<i2").tobytes())
+                          for name, data, mime_type in corpus]
+            ws_port = namespace["voice_channel_server"].socket.getsockname()[1]
+            voice_channel = (ws_port, pcm_corpus, namespace["SILENCE_TIMEOUT_S"] + 0.3, args.realtime)
+
+        if args.warmup_requests:
+            print(f"🔥 Sending {args.warmup_requests} warm-up request(s)...")
+            run_load(port, endpoints, corpus, args.warmup_requests, 1, args.voice, args.timeout, voice_channel)
+        warmup_request_ids = read_request_ids(log_path)
+
+        print(f"🚀 Replaying {args.requests} request(s) from {len(corpus)} utterance(s) "
+              f"at concurrency {args.concurrency} against {', '.join(endpoints)}...")
+        results, wall_seconds = run_load(port, endpoints, corpus, args.requests, args.concurrency,
+                                         args.voice, args.timeout, voice_channel)
+        run_config = {
+            "endpoints": endpoints, "requests": args.requests, "concurrency": args.concurrency,
+            "corpus": [name for name, _, _ in corpus], "real_models": args.real_models,
+            "overrides": dict(item.split("=", 1) for item in args.set),
+            "standins": None if args.real_models else dataclasses.asdict(config),
+        }
+        report = build_report(results, wall_seconds, log_path, warmup_request_ids, run_config)
+        report["startup"] = startup
+        print_report(report)
+    finally:
+        if args.keep_workdir:
+            print(f"📁 Kept working directory: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json_path}")
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ Regressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            exit_code = 1
+        else:
+            print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    # Waitress and the notebook's worker threads are daemons; exit without waiting for them
+    sys.stdout.flush()
+    os._exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Local stand-ins for the services and models used by the server notebook.
+
+`install(config, real_models=False)` registers fake modules in `sys.modules` so the notebook cells
+can be executed outside Colab with no network:
+
+- `google.colab` and `pyngrok` are always replaced (no upload widget, no tunnel).
+- `google.generativeai` is always replaced by a local chat model with configurable
+  time-to-first-token and token rate.
+- `faster_whisper`, `melo` and `openvoice` are replaced by lightweight stand-ins that sleep for a
+  configurable time per call, unless `real_models=True`, in which case the real packages are used.
+- `torch.hub.load` of Silero VAD returns an energy-based stand-in (always, since it needs GitHub).
+
+Every stand-in only implements the surface the notebook actually touches.
+"""
+import itertools
+import math
+import random
+import sys
+import threading
+import time
+import types
+from collections import namedtuple
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+
+
+@dataclass
+class StandInConfig:
+    """Latency model of the stand-ins. All times are wall-clock sleeps, so they overlap like real I/O or GPU waits."""
+    llm_first_token_ms: float = 450.0
+    llm_tokens_per_second: float = 60.0
+    llm_reply_sentences: int = 2
+    llm_repeat_replies: bool = False  # True: every reply is identical (exercises the speech cache)
+    asr_batch_ms: float = 250.0       # Cost of one batched Whisper medium pass with beam 5...
+    asr_item_ms: float = 40.0         # ...plus this much per extra utterance in the batch
+    asr_low_confidence_rate: float = 0.0  # Share of transcripts from models smaller than medium with a low avg_logprob
+    asr_text: str = "Can you tell me something interesting about the weather today?"
+    asr_language: str = "en"          # Detected language; a comma-separated list ("en,es") alternates per utterance
+    tts_ms_per_char: float = 6.0
+    tts_audio_seconds_per_char: float = 0.065
+    convert_ms_per_audio_second: float = 35.0
+    tts_model_mb: float = 200.0       # Reported size of each MeloTTS model (memory is reserved, never touched)
+    model_load_ms: float = 0.0        # Load time of each model (Whisper, MeloTTS, OpenVoice, Silero VAD)
+
+
+def _sleep_ms(milliseconds):
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000.0)
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def _tone(seconds, sample_rate):
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    return (0.1 * np.sin(2 * math.pi * 220.0 * t)).astype(np.float32)
+
+
+class _HParams:
+    """Attribute bag mimicking the `hps` objects of MeloTTS and OpenVoice."""
+    def __init__(self, **values):
+        for key, value in values.items():
+            setattr(self, key, _HParams(**value) if isinstance(value, dict) else value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+    def keys(self):
+        return self.__dict__.keys()
+
+
+# --- Gemini ---------------------------------------------------------------------------------
+
+_Part = namedtuple("Part", ["text"])
+_UsageMetadata = namedtuple("UsageMetadata", ["prompt_token_count", "candidates_token_count", "total_token_count"])
+
+
+class _Content:
+    """A chat history entry, shaped like `genai.protos.Content`."""
+    def __init__(self, role, parts):
+        self.role = role
+        self.parts = [part if isinstance(part, _Part) else _Part(part if isinstance(part, str) else str(part))
+                      for part in parts]
+
+
+def _to_content(entry):
+    return entry if isinstance(entry, _Content) else _Content(entry["role"], entry["parts"])
+
+
+def _count_tokens(texts):
+    """Same rough rule the real API's counts follow for English text: about 4 characters per token."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+class _Chunk:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _StreamingResponse:
+    """Iterable of chunks; `usage_metadata` is filled in once the stream has been read to the end."""
+    def __init__(self, chunks_iter):
+        self._chunks = chunks_iter
+        self.usage_metadata = None
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if chunk.usage_metadata is not None:
+                self.usage_metadata = chunk.usage_metadata
+            yield chunk
+
+
+class StandInChatSession:
+    """
+    Follows the real ChatSession's history rules: a turn (user message and reply) only joins the history once
+    the reply is complete, and `rewind()` drops the unfinished streamed turn if there is one, otherwise the
+    last complete turn. A `send_message` that fails therefore leaves the history untouched.
+    """
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+        self._last_sent = None      # Streamed turn whose reply has not been read to the end yet
+        self._last_received = None
+
+    @property
+    def history(self):
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = [_to_content(entry) for entry in history or []]
+
+    def send_message(self, content, stream=False, **kwargs):
+        reply = self.model.next_reply()
+        sent = _Content("user", content if isinstance(content, list) else [content])
+        usage = self._usage(sent, reply)
+        if not stream:
+            _sleep_ms(self.model.config.llm_first_token_ms)
+            time.sleep(len(reply.split()) / self.model.config.llm_tokens_per_second)
+            self._history.extend([sent, _Content("model", [reply])])
+            return _Chunk(reply, usage)
+        response = _StreamingResponse(self._stream(sent, reply, usage))
+        self._last_sent, self._last_received = sent, response
+        return response
+
+    def _usage(self, sent, reply):
+        entries = [*self._history, sent]
+        prompt = [self.model.system_instruction or ""] + [part.text for entry in entries for part in entry.parts]
+        prompt_tokens, reply_tokens = _count_tokens(prompt), _count_tokens([reply])
+        return _UsageMetadata(prompt_tokens, reply_tokens, prompt_tokens + reply_tokens)
+
+    def _stream(self, sent, reply, usage):
+        _sleep_ms(self.model.config.llm_first_token_ms)
+        words = reply.split(" ")
+        for i in range(0, len(words), 4):
+            time.sleep(len(words[i:i + 4]) / self.model.config.llm_tokens_per_second)
+            last = i + 4 >= len(words)
+            yield _Chunk(" ".join(words[i:i + 4]) + ("" if last else " "), usage if last else None)
+        # Like the real ChatSession, a streamed turn only joins the history once its reply has been fully read
+        if self._last_sent is sent:
+            self._history.extend([sent, _Content("model", [reply])])
+            self._last_sent = self._last_received = None
+
+    def rewind(self):
+        """Drops the unfinished streamed turn if there is one, otherwise the last complete turn."""
+        if self._last_sent is None:
+            return self._history.pop(-2), self._history.pop()
+        sent, self._last_sent, self._last_received = self._last_sent, None, None
+        return sent, None
+
+
+class StandInGenerativeModel:
+    def __init__(self, model_name, system_instruction=None, config=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.config = config
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_reply(self):
+        with self._lock:
+            n = 1 if self.config.llm_repeat_replies else next(self._counter)
+        return " ".join(
+            f"This is simulated sentence {s + 1} of reply {n}, long enough to be synthesized on its own."
+            for s in range(self.config.llm_reply_sentences)
+        )
+
+    def start_chat(self, history=None):
+        return StandInChatSession(self, history)
+
+    def generate_content(self, contents, **kwargs):
+        """One-shot generation (used for history summaries): a short reply after the usual latency."""
+        _sleep_ms(self.config.llm_first_token_ms)
+        entries = [_to_content(entry) for entry in contents]
+        reply = f"The user and the assistant exchanged {len(entries) - 1} messages about simulated topics."
+        time.sleep(len(reply.split()) / self.config.llm_tokens_per_second)
+        return _Chunk(reply)
+
+
+# --- Faster Whisper --------------------------------------------------------------------------
+
+_Segment = namedtuple("Segment", ["text", "avg_logprob", "no_speech_prob"])
+_Info = namedtuple("TranscriptionInfo", ["language", "language_probability", "duration"])
+_GenerationResult = namedtuple("WhisperGenerationResult", ["sequences_ids", "scores", "no_speech_prob"])
+# Cost of a Whisper size relative to medium
+_WHISPER_SIZE_COST = {"tiny": 0.1, "base": 0.2, "small": 0.4, "medium": 1.0, "large-v3": 2.0}
+
+
+class _StandInFeatureExtractor:
+    def __call__(self, audio, *args, **kwargs):
+        return np.zeros((80, max(1, len(audio) // 160)), dtype=np.float32)
+
+
+def _beam_cost(beam_size):
+    """Cost of a beam width relative to beam 5 (the encoder pass is shared, decoding grows with the beam)."""
+    return 0.6 + 0.08 * beam_size
+
+
+class _StandInCT2Whisper:
+    is_multilingual = True
+
+    def __init__(self, config, size):
+        self.config = config
+        self.size_cost = _WHISPER_SIZE_COST.get(size, 1.0)
+        self._random = random.Random(size)
+        self._languages = itertools.cycle([code.strip() for code in config.asr_language.split(",") if code.strip()])
+        self._lock = threading.Lock()
+
+    def detect_language(self, encoder_output):
+        """Per item, every language token with its probability, most likely first (like CTranslate2)."""
+        with self._lock:
+            detected = [next(self._languages) for _ in range(len(encoder_output))]
+        return [[(f"<|{code}|>", 0.9)] + [(f"<|{other}|>", 0.1 / 2) for other in ("en", "es") if other != code]
+                for code in detected]
+
+    def generate(self, features, prompts, beam_size=5, **kwargs):
+        _sleep_ms((self.config.asr_batch_ms + self.config.asr_item_ms * (len(prompts) - 1))
+                  * self.size_cost * _beam_cost(beam_size))
+        return [_GenerationResult([[1, 2, 3]], [self.avg_logprob()], 0.01) for _ in prompts]
+
+    def avg_logprob(self):
+        with self._lock:
+            low = self.size_cost < 1.0 and self._random.random() < self.config.asr_low_confidence_rate
+        return -1.2 if low else -0.2
+
+
+class StandInWhisperModel:
+    def __init__(self, model_size_or_path, device="auto", compute_type="default", config=None, **kwargs):
+        _sleep_ms(config.model_load_ms)
+        self.config = config
+        self.model = _StandInCT2Whisper(config, model_size_or_path)
+        self.hf_tokenizer = None
+        self.max_length = 448
+        self.feature_extractor = _StandInFeatureExtractor()
+
+    def get_prompt(self, tokenizer, previous_tokens, without_timestamps=False, **kwargs):
+        return [50258]
+
+    def encode(self, features):
+        return features
+
+    def transcribe(self, audio, language=None, beam_size=5, **kwargs):
+        _sleep_ms(self.config.asr_batch_ms * self.model.size_cost * _beam_cost(beam_size))
+        duration = len(audio) / 16000 if hasattr(audio, "__len__") else 0.0
+        segments = [_Segment(" " + self.config.asr_text, self.model.avg_logprob(), 0.01)]
+        if language is None:
+            language = self.model.detect_language([audio])[0][0][0][2:-2]
+        return iter(segments), _Info(language, 1.0, duration)
+
+
+def _whisper_modules(config):
+    class Tokenizer:
+        def __init__(self, hf_tokenizer, multilingual, task=None, language=None):
+            self.language = language
+
+        def decode(self, tokens):
+            return " " + config.asr_text
+
+    def pad_or_trim(array, length=3000, axis=-1):
+        if array.shape[axis] >= length:
+            return array.take(indices=range(length), axis=axis)
+        pad_widths = [(0, 0)] * array.ndim
+        pad_widths[axis] = (0, length - array.shape[axis])
+        return np.pad(array, pad_widths)
+
+    class VadOptions:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    def get_speech_timestamps(audio, vad_options=None, **kwargs):
+        return [{"start": 0, "end": len(audio)}] if len(audio) else []
+
+    def whisper_model(*args, **kwargs):
+        return StandInWhisperModel(*args, config=config, **kwargs)
+
+    package = _module("faster_whisper", WhisperModel=whisper_model)
+    package.__path__ = []
+    return {
+        "faster_whisper": package,
+        "faster_whisper.audio": _module("faster_whisper.audio", pad_or_trim=pad_or_trim),
+        "faster_whisper.tokenizer": _module("faster_whisper.tokenizer", Tokenizer=Tokenizer),
+        "faster_whisper.vad": _module("faster_whisper.vad", VadOptions=VadOptions,
+                                      get_speech_timestamps=get_speech_timestamps),
+    }
+
+
+# --- MeloTTS ----------------------------------------------------------------------------------
+
+# One phone per letter; spaces and punctuation map to the pause symbol, like MeloTTS's 'SP'
+_MELO_SYMBOLS = ["_", "SP", "UNK"] + list("abcdefghijklmnopqrstuvwxyz")
+
+
+class _StandInSynthesizer:
+    """Stands in for MeloTTS's SynthesizerTrn: audio plus an alignment with a fixed number of frames per phone."""
+    def __init__(self, config, hop_length, sampling_rate):
+        self.config = config
+        self.hop_length = hop_length
+        self.sampling_rate = sampling_rate
+
+    def infer(self, x, x_lengths, sid, tone, language, bert, ja_bert, length_scale=1.0, **kwargs):
+        phones = int(x.shape[1])
+        # Every phone (blanks included) stands for half a character
+        _sleep_ms(self.config.tts_ms_per_char * phones / 2)
+        seconds_per_phone = self.config.tts_audio_seconds_per_char / 2 * length_scale
+        frames_per_phone = max(1, round(seconds_per_phone * self.sampling_rate / self.hop_length))
+        attn = torch.zeros(1, 1, phones * frames_per_phone, phones)
+        for i in range(phones):
+            attn[0, 0, i * frames_per_phone:(i + 1) * frames_per_phone, i] = 1.0
+        audio = torch.from_numpy(_tone(phones * frames_per_phone * self.hop_length / self.sampling_rate,
+                                       self.sampling_rate))
+        return audio.view(1, 1, -1), attn, None, None
+
+
+_MELO_SPEAKERS = {
+    "EN": {"EN-US": 0, "EN-BR": 1, "EN_INDIA": 2, "EN-AU": 3, "EN-Default": 4},
+    "ES": {"ES": 0},
+}
+
+
+class StandInTTS(torch.nn.Module):
+    def __init__(self, language, device="auto", config=None, **kwargs):
+        super().__init__()
+        _sleep_ms(config.model_load_ms)
+        # Sized like the real model so memory budgets behave the same; torch.empty never touches the pages
+        self.register_buffer("_weights", torch.empty(int(config.tts_model_mb * 2**20) // 4), persistent=False)
+        self.config = config
+        self.language = language
+        self.device = device
+        self.symbol_to_id = {s: i for i, s in enumerate(_MELO_SYMBOLS)}
+        self.hps = _HParams(data={
+            "sampling_rate": 44100,
+            "hop_length": 512,
+            "spk2id": _MELO_SPEAKERS[language],
+        })
+        self.model = _StandInSynthesizer(config, self.hps.data.hop_length, self.hps.data.sampling_rate)
+
+    @staticmethod
+    def split_sentences_into_pieces(text, language, quiet=False):
+        return [piece.strip() for piece in text.replace("!", ".").replace("?", ".").split(".") if piece.strip()]
+
+    @staticmethod
+    def audio_numpy_concat(segment_data_list, sr, speed=1.0):
+        gap = np.zeros(int((sr * 0.05) / speed), dtype=np.float32)
+        return np.concatenate([part for segment in segment_data_list for part in (segment.reshape(-1), gap)])
+
+    def tts_to_file(self, text, speaker_id, output_path=None, speed=1.0, quiet=False, **kwargs):
+        _sleep_ms(self.config.tts_ms_per_char * len(text))
+        audio = _tone(len(text) * self.config.tts_audio_seconds_per_char / speed, self.hps.data.sampling_rate)
+        if output_path is None:
+            return audio
+        import soundfile
+        soundfile.write(output_path, audio, self.hps.data.sampling_rate)
+
+
+def _melo_modules(config):
+    def tts(*args, **kwargs):
+        return StandInTTS(*args, config=config, **kwargs)
+
+    def get_text_for_tts_infer(text, language, hps, device, symbol_to_id):
+        phones = [symbol_to_id.get(c, symbol_to_id["SP"]) for c in text.lower()]
+        # MeloTTS intersperses a blank between phones
+        phones = [0] + [p for phone in phones for p in (phone, 0)]
+        size = len(phones)
+        return (torch.zeros(1024, size), torch.zeros(768, size), torch.LongTensor(phones),
+                torch.zeros(size, dtype=torch.long), torch.zeros(size, dtype=torch.long))
+
+    package = _module("melo")
+    package.__path__ = []
+    utils = _module("melo.utils", get_text_for_tts_infer=get_text_for_tts_infer)
+    package.utils = utils
+    return {"melo": package, "melo.api": _module("melo.api", TTS=tts), "melo.utils": utils}
+
+
+# --- OpenVoice --------------------------------------------------------------------------------
+
+class _StandInVoiceConversion:
+    def __init__(self, config, hop_length, sampling_rate):
+        self.config = config
+        self.hop_length = hop_length
+        self.sampling_rate = sampling_rate
+
+    def voice_conversion(self, spec, spec_lengths, sid_src=None, sid_tgt=None, tau=0.3):
+        samples = int(spec.shape[-1]) * self.hop_length
+        _sleep_ms(self.config.convert_ms_per_audio_second * samples / self.sampling_rate)
+        audio = torch.from_numpy(_tone(samples / self.sampling_rate, self.sampling_rate))
+        return audio.view(1, 1, -1), None, None
+
+
+class StandInToneColorConverter:
+    def __init__(self, config_path, device="cpu", config=None, **kwargs):
+        _sleep_ms(config.model_load_ms)
+        self.device = device
+        self.hps = _HParams(data={"sampling_rate": 22050, "filter_length": 1024, "hop_length": 256, "win_length": 1024})
+        self.model = _StandInVoiceConversion(config, self.hps.data.hop_length, self.hps.data.sampling_rate)
+
+    def load_ckpt(self, ckpt_path):
+        pass
+
+    def add_watermark(self, audio, message):
+        return audio
+
+
+def _openvoice_modules(config):
+    def get_se(audio_path, vc_model, target_dir="processed", vad=True):
+        return torch.zeros(1, 256, 1), "reference"
+
+    def spectrogram_torch(y, n_fft, sampling_rate, hop_size, win_size, center=False):
+        return torch.zeros(1, n_fft // 2 + 1, max(1, y.shape[-1] // hop_size))
+
+    def converter(*args, **kwargs):
+        return StandInToneColorConverter(*args, config=config, **kwargs)
+
+    package = _module("openvoice")
+    package.__path__ = []
+    se_extractor = _module("openvoice.se_extractor", get_se=get_se)
+    package.se_extractor = se_extractor
+    return {
+        "openvoice": package,
+        "openvoice.se_extractor": se_extractor,
+        "openvoice.api": _module("openvoice.api", ToneColorConverter=converter),
+        "openvoice.mel_processing": _module("openvoice.mel_processing", spectrogram_torch=spectrogram_torch),
+    }
+
+
+# --- Silero VAD -------------------------------------------------------------------------------
+
+class StandInSileroVad(torch.nn.Module):
+    """Energy-based speech probability; stateless, so deep copies per connection are trivially safe."""
+    def forward(self, frame, sample_rate):
+        rms = torch.sqrt(torch.mean(frame.float() ** 2))
+        return torch.clamp(rms * 20.0, 0.0, 1.0).view(1, 1)
+
+    def reset_states(self):
+        pass
+
+
+def _patch_torch_hub(config):
+    original_load = torch.hub.load
+
+    def load(repo_or_dir, model, *args, **kwargs):
+        if "silero-vad" in repo_or_dir:
+            _sleep_ms(config.model_load_ms)
+            return StandInSileroVad(), None
+        return original_load(repo_or_dir, model, *args, **kwargs)
+
+    torch.hub.load = load
+
+
+# --- Colab & ngrok ----------------------------------------------------------------------------
+
+def _colab_modules():
+    def upload():
+        raise RuntimeError("google.colab.files.upload() is not available in the benchmark harness")
+
+    package = _module("google.colab", files=_module("google.colab.files", upload=upload))
+    package.__path__ = []
+    return {"google.colab": package, "google.colab.files": package.files}
+
+
+def _ngrok_modules():
+    class _Conf:
+        auth_token = None
+        region = None
+
+    class _Tunnel:
+        def __init__(self, port):
+            self.public_url = f"http://127.0.0.1:{port}"
+
+        def __str__(self):
+            return self.public_url
+
+    default_conf = _Conf()
+    ngrok = _module("pyngrok.ngrok", kill=lambda: None, connect=lambda port, *a, **k: _Tunnel(port))
+    conf = _module("pyngrok.conf", get_default=lambda: default_conf)
+    package = _module("pyngrok", ngrok=ngrok, conf=conf)
+    package.__path__ = []
+    return {"pyngrok": package, "pyngrok.ngrok": ngrok, "pyngrok.conf": conf}
+
+
+def _genai_modules(config):
+    def generative_model(*args, **kwargs):
+        return StandInGenerativeModel(*args, config=config, **kwargs)
+
+    return {"google.generativeai": _module("google.generativeai", configure=lambda **kwargs: None,
+                                           GenerativeModel=generative_model)}
+
+
+def install(config, real_models=False):
+    """Registers the stand-in modules. Returns the names that were installed."""
+    modules = {}
+    modules.update(_colab_modules())
+    modules.update(_ngrok_modules())
+    modules.update(_genai_modules(config))
+    if not real_models:
+        modules.update(_whisper_modules(config))
+        modules.update(_melo_modules(config))
+        modules.update(_openvoice_modules(config))
+        try:
+            import nltk  # noqa: F401  (imported by the notebook, only used by the real MeloTTS)
+        except ImportError:
+            modules["nltk"] = _module("nltk")
+
+    try:
+        import google
+    except ImportError:
+        google = _module("google")
+        google.__path__ = []
+        modules["google"] = google
+    sys.modules.update(modules)
+    _patch_torch_hub(config)
+    google.colab = modules["google.colab"]
+    google.generativeai = modules["google.generativeai"]
+    return sorted(modules)